@@ -1,9 +1,11 @@
 import argparse
 import contextlib
-import math
+import functools
 import os
 import random
 
+import numpy as np
+
 with contextlib.redirect_stdout(open(os.devnull, 'w')):
     import pygame as pg
 
@@ -22,18 +24,18 @@ def align(rects, **kwargs):
             setattr(r2, k2, getattr(r1, k1))
 
 def wrap(rects):
-    attrs = ((rect.left, rect.top, rect.right, rect.bottom) for rect in rects)
-    lefts, tops, rights, bottoms = zip(*attrs)
-    left, top, right, bottom = min(lefts), min(tops), max(rights), max(bottoms)
-    return pg.Rect(left, top, right - left, bottom - top)
+    first, *rest = rects
+    return pg.Rect(first).unionall(rest)
 
 def randomxy(inside):
-    x = random.randint(inside.left, inside.right)
-    y = random.randint(inside.top, inside.bottom)
+    # same inclusive range as randint, without its per-call overhead
+    rand = random.random
+    x = inside.left + int(rand() * (inside.width + 1))
+    y = inside.top + int(rand() * (inside.height + 1))
     return (x, y)
 
 def randomresolve(rect, inside, rects):
-    while any(rect.colliderect(r) for r in rects):
+    while rect.collidelist(rects) != -1:
         rect.topleft = randomxy(inside)
 
 class image:
@@ -77,8 +79,10 @@ class Screen:
 
     def __init__(self, size):
         self.image = pg.display.set_mode(size)
-        self.background = self.image.copy()
         self.rect = self.image.get_rect()
+        # display format for the fast blit path when clearing
+        self.background = pg.Surface(self.rect.size).convert()
+        self.background.fill((0, 0, 0))
 
     def clear(self):
         self.image.blit(self.background, (0, 0))
@@ -86,31 +90,113 @@ class Screen:
     def flip(self):
         pg.display.flip()
 
-    def update(self):
-        self.flip()
+    def update(self, rects=None):
+        if rects is None:
+            self.flip()
+        elif rects:
+            pg.display.update(rects)
 
 
 class Engine:
 
+    # most scene updates to run in one frame before giving up on catching up
+    maxsteps = 5
+
     def __init__(self, clock, screen):
         self.clock = clock
         self.screen = screen
 
+    def steps(self, lag, step):
+        """
+        Return how many fixed steps to update for `lag` milliseconds behind,
+        and the lag left over. A step of None is uncapped, one update per
+        frame.
+        """
+        if step is None:
+            return 1, 0
+        steps = int(lag // step)
+        if steps > self.maxsteps:
+            # too far behind, drop the rest rather than fast-forward.
+            return self.maxsteps, 0
+        # tick is in whole milliseconds, a frame landing just short of a step
+        # still gets its update instead of doubling up on the next.
+        steps = max(1, steps)
+        return steps, max(0, lag - steps * step)
+
+    def filter_events(self, dispatcher):
+        """
+        Block high rate motion events the dispatcher does not handle, so they
+        are dropped by SDL instead of being queued and skipped.
+        """
+        handled = [t for t in motion_events if t in dispatcher]
+        unhandled = [t for t in motion_events if t not in dispatcher]
+        # empty lists are not no-ops for these, None means every type.
+        if handled:
+            pg.event.set_allowed(handled)
+        if unhandled:
+            pg.event.set_blocked(unhandled)
+
     def run(self, scene):
         scene.begin()
-        while not pg.event.peek(pg.QUIT):
-            dt = self.clock.tick()
+        self.filter_events(scene.dispatcher)
+        # dirty rect scenes never push the background themselves.
+        self.screen.clear()
+        self.screen.flip()
+        # scenes update in fixed steps of one frame at the target rate, so
+        # long frames are caught up on instead of slowing the game down.
+        # framerate 0 is uncapped for pygame, there is no step to keep.
+        if self.clock.framerate:
+            step = 1000 / self.clock.framerate
+        else:
+            step = None
+        lag = 0
+        running = True
+        while running:
+            lag += self.clock.tick()
+            # one batch per frame, quit is picked out of it rather than
+            # peeking the queue again.
+            handler = scene.dispatcher.handler
+            exposed = False
             for event in pg.event.get():
-                if event.type in scene.dispatcher:
-                    scene.dispatcher[event.type](event)
-            scene.update()
-            self.screen.clear()
-            scene.draw(self.screen.image)
-            self.screen.update()
+                method = handler(event.type)
+                if method is not None:
+                    method(event)
+                if event.type == pg.QUIT:
+                    running = False
+                elif event.type in expose_events:
+                    exposed = True
+            steps, lag = self.steps(lag, step)
+            for _ in range(steps):
+                scene.update()
+            scene.clear(self.screen.image, self.screen.background)
+            dirty = scene.draw(self.screen.image)
+            # the window lost what was outside the dirty rects, push it all.
+            if scene.dirtyrects and not exposed:
+                self.screen.update(dirty)
+            else:
+                self.screen.update()
 
 
 event_method_prefix = 'on_'
 
+# event types that arrive in floods while devices move. anything else, like
+# TEXTINPUT which fills in KEYDOWN.unicode, is always let through.
+motion_events = (
+    pg.MOUSEMOTION,
+    pg.JOYAXISMOTION,
+    pg.JOYBALLMOTION,
+    pg.JOYHATMOTION,
+    pg.CONTROLLERAXISMOTION,
+    pg.FINGERMOTION,
+)
+
+# the window needs redrawing in full after one of these.
+expose_events = (
+    pg.WINDOWEXPOSED,
+    pg.VIDEOEXPOSE,
+)
+
+@functools.lru_cache(maxsize=None)
 def event_method_name(event_type):
     """
     :param event_type: pygame event type
@@ -122,22 +208,56 @@ class Dispatcher:
 
     def __init__(self, parent):
         self.parent = parent
+        # event type -> bound handler or None, filled as types are first seen.
+        # handlers should be set through __setitem__ to keep this current.
+        self._handlers = {}
+
+    def handler(self, event_type):
+        """
+        Return the handler for `event_type` or None.
+        """
+        try:
+            return self._handlers[event_type]
+        except KeyError:
+            handler = getattr(self, event_method_name(event_type), None)
+            self._handlers[event_type] = handler
+            return handler
 
     def __contains__(self, event_type):
-        attrname = event_method_name(event_type)
-        return attrname in dir(self)
+        return self.handler(event_type) is not None
 
     def __getitem__(self, event_type):
-        attrname = event_method_name(event_type)
-        return getattr(self, attrname)
+        handler = self.handler(event_type)
+        if handler is None:
+            raise KeyError(event_type)
+        return handler
 
     def __setitem__(self, event_type, func):
         setattr(self, event_method_name(event_type), func)
+        self._handlers[event_type] = func
 
 
 class Font(pg.font.Font):
 
+    # most recent renders kept, text that keeps changing like a score would
+    # otherwise hold on to one surface per value.
+    cachesize = 64
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._rendered = functools.lru_cache(maxsize=self.cachesize)(self._render)
+
     def render(self, text, color, antialias=True, background=None):
+        """
+        Render multi-line text. Recent results are cached, every call still
+        returns its own surface.
+        """
+        if background is not None:
+            background = tuple(pg.Color(background))
+        color = tuple(pg.Color(color))
+        return self._rendered(text, color, antialias, background).copy()
+
+    def _render(self, text, color, antialias, background):
         images = [
             super(Font, self).render(line, antialias, color, background)
             for line in text.splitlines()]
@@ -152,6 +272,9 @@ class Font(pg.font.Font):
 class Scene:
 
     dispatcher_class = Dispatcher
+    # set when clear and draw only touch the areas that changed and draw
+    # returns them, so only those are pushed to the display.
+    dirtyrects = False
 
     def __init__(self, engine):
         self.engine = engine
@@ -160,6 +283,10 @@ class Scene:
     def begin(self):
         pass
 
+    def clear(self, image, background):
+        # the whole screen, scenes that know what they drew clear less.
+        self.engine.screen.clear()
+
     def draw(self, image):
         pass
 
@@ -167,59 +294,131 @@ class Scene:
         pass
 
 
-class Particle(pg.sprite.Sprite):
+class Particles:
+    """
+    Single pixel particles kept as arrays, moved together and drawn straight
+    into the target's pixels. Not a sprite, the scene updates and draws them.
+    Later bursts can be added with `extend`.
+
+    :param positions: sequence of (x, y).
+    :param colors: sequence of (r, g, b, a), one per position.
+    :param accel: sequence of (ax, ay), one per position.
+    :param ttl: frames each particle lives for.
+    :param bounds: rect outside of which particles are dropped, defaults to
+                   the display. must lie inside the images drawn to.
+    """
 
-    def __init__(self, *groups, size=None, color=None, ttl=None):
-        super().__init__(*groups)
-        if size is None:
-            size = (1, 1)
-        self.image = pg.Surface(size, pg.SRCALPHA)
-        if color is None:
-            color = (200, 200, 200, 125)
-        self.image.fill(color)
-        self.rect = self.image.get_rect()
-        self.x = self.y = 0
-        self.vx = self.vy = 0
-        self.ax = self.ay = 0
-        self.t = 0
+    # side of the squares dirty areas are reported in.
+    tilesize = 16
+
+    def __init__(self, positions, colors, accel=None, ttl=None, bounds=None):
+        self.position = np.empty((0, 2))
+        self.velocity = np.empty((0, 2))
+        self.accel = np.empty((0, 2))
+        self.colors = np.empty((0, 4), dtype=np.uint8)
+        self.age = np.empty(0, dtype=int)
         if ttl is None:
             ttl = 60 * 3
         self.ttl = ttl
+        if bounds is None:
+            bounds = pg.display.get_surface().get_rect()
+        self.bounds = bounds
+        # pixels drawn over last, for clear to put back.
+        self.drawn = (np.empty(0, dtype=int), np.empty(0, dtype=int))
+        self.extend(positions, colors, accel=accel)
+
+    def extend(self, positions, colors, accel=None):
+        positions = np.array(positions, dtype=float).reshape(-1, 2)
+        if accel is None:
+            accel = np.zeros_like(positions)
+        accel = np.array(accel, dtype=float).reshape(-1, 2)
+        colors = np.array(colors, dtype=np.uint8).reshape(-1, 4)
+        self.position = np.concatenate((self.position, positions))
+        self.velocity = np.concatenate((self.velocity, np.zeros_like(positions)))
+        self.accel = np.concatenate((self.accel, accel))
+        self.colors = np.concatenate((self.colors, colors))
+        self.age = np.concatenate((self.age, np.zeros(len(positions), dtype=int)))
+        self.cull()
 
-    def update(self, *args):
-        self.vx += self.ax
-        self.vy += self.ay
-        self.x += self.vx
-        self.y += self.vy
-        self.rect.topleft = (self.x, self.y)
-        self.t += 1
-        if self.t > self.ttl:
-            self.kill()
+    def update(self):
+        self.velocity += self.accel
+        self.position += self.velocity
+        self.age += 1
+        self.cull()
+
+    def points(self):
+        xy = np.rint(self.position).astype(int)
+        return xy[:,0], xy[:,1]
+
+    def cull(self):
+        xs, ys = self.points()
+        # outside the bounds they are moving away for good, stop carrying them.
+        keep = ((self.age <= self.ttl)
+                & (xs >= self.bounds.left) & (xs < self.bounds.right)
+                & (ys >= self.bounds.top) & (ys < self.bounds.bottom))
+        if not keep.all():
+            self.position = self.position[keep]
+            self.velocity = self.velocity[keep]
+            self.accel = self.accel[keep]
+            self.colors = self.colors[keep]
+            self.age = self.age[keep]
+
+    def clear(self, image, background):
+        xs, ys = self.drawn
+        if len(xs):
+            pixels = pg.surfarray.pixels3d(image)
+            pixels[xs, ys] = pg.surfarray.pixels3d(background)[xs, ys]
 
+    def draw(self, image):
+        """
+        Blend the particles into `image` and return the dirty areas, covering
+        where they were drawn last time too.
+        """
+        xs, ys = self.points()
+        if len(xs):
+            pixels = pg.surfarray.pixels3d(image)
+            under = pixels[xs, ys].astype(float)
+            alpha = self.colors[:,3:] / 255
+            pixels[xs, ys] = under + (self.colors[:,:3] - under) * alpha
+        lastxs, lastys = self.drawn
+        self.drawn = (xs, ys)
+        return self.tiles(np.concatenate((lastxs, xs)),
+                          np.concatenate((lastys, ys)))
+
+    def tiles(self, xs, ys):
+        size = self.tilesize
+        # one integer per tile, sorting rows is much slower. points are inside
+        # the image so never negative.
+        tiles = np.unique((xs // size) << 16 | (ys // size))
+        lefts = ((tiles >> 16) * size).tolist()
+        tops = ((tiles & 0xffff) * size).tolist()
+        return [pg.Rect(x, y, size, size) for x, y in zip(lefts, tops)]
+
+
+def sprite2particles(sprite, alphathreshold=0, center=None, accel=None,
+                     into=None):
+    """
+    Explode a sprite into particles, one per pixel more opaque than
+    `alphathreshold` percent.
 
-def sprite2particles(sprite, alphathreshold=0, center=None, accel=None):
+    :param into: existing Particles to add to, otherwise a new one is made.
+    """
     if center is None:
         center = sprite.rect.center
-    centerx, centery = center
     if accel is None:
         accel = (.005, .005)
-    accelx, accely = accel
-    particles = []
-    for y in range(sprite.image.get_height()):
-        for x in range(sprite.image.get_width()):
-            color = sprite.image.get_at((x,y))
-            if color.hsva[3] > alphathreshold:
-                p = Particle(color=color)
-                p.x = sprite.rect.x + x
-                p.y = sprite.rect.y + y
-                dx = centerx - p.x
-                dy = centery - p.y
-                distance = math.hypot(dx, dy)
-                angle = math.atan2(dy, dx)
-                p.ax = math.cos(angle) * -distance * accelx
-                p.ay = math.sin(angle) * -distance * accely
-                particles.append(p)
-    return particles
+    alpha = pg.surfarray.array_alpha(sprite.image)
+    # widen first, alpha * 100 wraps around in uint8.
+    xs, ys = np.nonzero(alpha.astype(np.int32) * 100 > alphathreshold * 255)
+    rgb = pg.surfarray.array3d(sprite.image)[xs, ys]
+    colors = np.column_stack((rgb, alpha[xs, ys]))
+    positions = np.column_stack((xs, ys)) + sprite.rect.topleft
+    # accelerate away from center, proportional to distance.
+    accel = (positions - center) * accel
+    if into is None:
+        return Particles(positions, colors, accel=accel)
+    into.extend(positions, colors, accel=accel)
+    return into
 
 
 def tupint(s):
@@ -230,4 +429,4 @@ class ArgumentParser(argparse.ArgumentParser):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.add_argument('--size', default='800,600', type=tupint)
-        self.add_argument('--framerate', default=60)
+        self.add_argument('--framerate', default=60, type=int)
@@ -1,4 +1,5 @@
 import argparse
+import collections
 import contextlib
 import math
 import os
@@ -19,61 +20,83 @@ words = list(word for word in wordsgen()
              and set(word).issubset(string.ascii_lowercase))
 random.shuffle(words)
 
+wordsbyfirst = collections.defaultdict(list)
+for word in words:
+    wordsbyfirst[word[0]].append(word)
+
 class Letter(pg.sprite.Sprite):
 
+    fontsize = 32
+    # created on first use, pygame must be initialized first
+    font = None
+    # letter -> image, shared by every sprite of that letter
+    glyphs = {}
+
     def __init__(self, letter, *groups):
         if len(letter) != 1:
             raise RuntimeError('letter must be length 1, got %r' % letter)
         super().__init__(*groups)
         self.letter = letter
-        font = pg.font.Font(None, 32)
-        self.image = font.render(str(letter), True, (200,200,200))
+        if letter not in self.glyphs:
+            if Letter.font is None:
+                Letter.font = pg.font.Font(None, self.fontsize)
+            image = self.font.render(str(letter), True, (200,200,200))
+            self.glyphs[letter] = image.convert_alpha()
+        self.image = self.glyphs[letter]
         self.rect = self.image.get_rect()
 
-    def kill(self):
-        particles = fw.sprite2particles(self)
-        for group in self.groups():
-            group.add(*particles)
-        super().kill()
-
 
 class Word:
 
     def __init__(self, letters):
         self.original = letters
-        self.letters = self.original
-        self.sprites = list(map(Letter, self.letters))
+        # count of letters shot off the front
+        self.index = 0
+        self.sprites = collections.deque(map(Letter, self.original))
+        self._rects = tuple(sprite.rect for sprite in self.sprites)
         self.y = 0
         self.align()
 
     def align(self):
         fw.align(self.rects(), left='right', top='top')
 
+    @property
+    def letters(self):
+        return self.original[self.index:]
+
     def is_alive(self):
-        return bool(self.letters)
+        return self.index < len(self.original)
 
     def is_hit(self, letter):
-        return self.letters and letter == self.letters[0]
+        return self.is_alive() and letter == self.original[self.index]
 
     def rect(self):
         return fw.wrap(self.rects())
 
     def rects(self):
-        return tuple(sprite.rect for sprite in self.sprites)
+        # only changes when a letter is shot, not worth rebuilding every frame
+        return self._rects
 
     def shoot(self, letter):
         if not self.is_hit(letter):
             return
-        self.letters = self.letters[1:]
-        self.sprites[0].kill()
-        self.sprites.pop(0)
-        return True
+        self.index += 1
+        sprite = self.sprites.popleft()
+        sprite.kill()
+        self._rects = self._rects[1:]
+        return sprite
 
     def update(self, *args):
         if self.sprites:
             self.y += .5
-            self.sprites[0].rect.y = self.y
-            self.align()
+            head = self._rects[0]
+            top = head.y
+            head.y = self.y
+            # sub-pixel moves leave the rects where they were. otherwise they
+            # only move down together, the layout across is set at spawn.
+            if head.y != top:
+                for rect in self._rects[1:]:
+                    rect.y = head.y
 
 
 class TypingDispatcher(fw.Dispatcher):
@@ -88,52 +111,85 @@ class TypingDispatcher(fw.Dispatcher):
 class TypingScene(fw.Scene):
 
     dispatcher_class = TypingDispatcher
+    dirtyrects = True
 
     def begin(self):
-        self.sprites = pg.sprite.Group()
-        self.draw = self.sprites.draw
+        # only the areas sprites were drawn over get cleared
+        self.sprites = pg.sprite.RenderUpdates()
         self.words = []
         self.lock = None
+        # first letter -> word not shot at yet, spawn keeps these unique
+        self.untouched = {}
         self.nwords = 3
+        # every burst is added to this one, they move and draw together.
+        self.particles = fw.Particles((), ())
+        # horizontal extent words may spawn in, clear of the left margin.
+        screen = self.engine.screen.rect
+        self.spawnarea = pg.Rect(100, 0, screen.width - 100, 0)
 
     def letters(self):
-        return (sprite for sprite in self.sprites if isinstance(sprite, Letter))
+        # the words already hold their letters, don't sift them out of the
+        # particles with isinstance.
+        return (sprite for word in self.words for sprite in word.sprites)
+
+    def explode(self, sprite):
+        fw.sprite2particles(sprite, into=self.particles)
 
     def shoot(self, letter):
-        if self.lock and not self.lock.is_alive():
-            self.lock = None
         if self.lock:
-            self.lock.shoot(letter)
+            hit = self.lock.shoot(letter)
         else:
-            for word in self.words:
-                if word.shoot(letter):
-                    self.lock = word
-                    break
-
-    def spawn(self):
-        while True:
-            letters = random.choice(words)
-            taken = any(word.letters == letters for word in self.words)
-            if not taken:
+            hit = None
+            if letter in self.untouched:
+                self.lock = self.untouched.pop(letter)
+                hit = self.lock.shoot(letter)
+        if hit:
+            self.explode(hit)
+            if not self.lock.is_alive():
+                self.words.remove(self.lock)
+                self.lock = None
+
+    def spawn(self, nwords=1):
+        for _ in range(nwords):
+            # never start like a word that can still be targeted, so a first
+            # letter always picks out one word. first letters are weighted by
+            # how many words they start, any free word is as likely as another.
+            firsts = [letter for letter in wordsbyfirst
+                      if letter not in self.untouched]
+            if not firsts:
                 break
-        newword = Word(letters)
-        rect = newword.rect()
-        spawn = pg.Rect(100, -4 * rect.height, 800-100-rect.width, rect.height)
-        rect.topleft = fw.randomxy(spawn)
-        fw.randomresolve(rect, spawn, [w.rect() for w in self.words])
-        newword.sprites[0].rect.topleft = rect.topleft
-        newword.y = newword.sprites[0].rect.y
-        newword.align()
-        self.sprites.add(newword.sprites)
-        self.words.append(newword)
+            weights = [len(wordsbyfirst[letter]) for letter in firsts]
+            first, = random.choices(firsts, weights)
+            letters = random.choice(wordsbyfirst[first])
+            newword = Word(letters)
+            rect = newword.rect()
+            spawn = pg.Rect(self.spawnarea.left, -4 * rect.height,
+                            self.spawnarea.width - rect.width, rect.height)
+            rect.topleft = fw.randomxy(spawn)
+            fw.randomresolve(rect, spawn, [w.rect() for w in self.words])
+            newword.sprites[0].rect.topleft = rect.topleft
+            newword.y = newword.sprites[0].rect.y
+            newword.align()
+            self.sprites.add(newword.sprites)
+            self.words.append(newword)
+            self.untouched[first] = newword
 
     def update(self, *args):
         self.sprites.update(*args)
+        self.particles.update()
         if len(self.words) < self.nwords:
-            self.spawn()
+            self.spawn(self.nwords - len(self.words))
         for word in self.words:
             word.update(*args)
-        self.words = [word for word in self.words if word.is_alive()]
+
+    def clear(self, image, background):
+        self.sprites.clear(image, background)
+        self.particles.clear(image, background)
+
+    def draw(self, image):
+        dirty = self.sprites.draw(image)
+        dirty.extend(self.particles.draw(image))
+        return dirty
 
 
 def main(argv=None):